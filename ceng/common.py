@@ -1,4 +1,48 @@
-import numpy as np
+import functools
+import operator
+import os
+import types
+
+# stand-in for numba.prange in functions decorated with lazy_njit; swapped for numba.prange when compiled
+prange = range
+
+
+def _compile_with_numba(func, options):
+    """Compile func using numba.njit, or return func unchanged if numba is not available or disabled."""
+
+    if os.environ.get("CENG_NO_NUMBA", "").strip().lower() in ("1", "true", "yes", "on"):
+        return func
+    try:
+        import numba
+    except ImportError:
+        return func
+    func_globals = dict(func.__globals__, prange=numba.prange)
+    func_copy = types.FunctionType(func.__code__, func_globals, func.__name__, func.__defaults__, func.__closure__)
+    functools.update_wrapper(func_copy, func)
+    return numba.njit(**options)(func_copy)
+
+
+def lazy_njit(**options):
+    """Decorator that compiles a function with numba.njit when it is first called.
+
+    numba is not imported until then. If numba is not installed, or the CENG_NO_NUMBA environment variable is set to
+    1 (or true), the plain python function (also available as the py_func attribute) is used instead.
+    """
+
+    def decorator(func):
+        compiled = None
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            nonlocal compiled
+            if compiled is None:
+                compiled = _compile_with_numba(func, options)
+            return compiled(*args)
+
+        wrapper.py_func = func
+        return wrapper
+
+    return decorator
 
 
 def flatten(maybe_seq):
@@ -8,37 +52,32 @@ def flatten(maybe_seq):
         return [maybe_seq]
     if n == 0:
         return maybe_seq
-    elif n == 1:
-        item = maybe_seq[0]
+
+    # iterate with an explicit stack (items pushed in reverse) to avoid recursion and temporary lists
+    out = []
+    stack = [maybe_seq]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, (str, bytes)):
+            out.append(item)
+            continue
         try:
-            return flatten(list(item))
+            it = iter(item)
         except TypeError:
-            return [item]
-    else:
-        k = n // 2
-        return flatten(maybe_seq[:k]) + flatten(maybe_seq[k:])
-
-
-class InfoArray(np.ndarray):
-    """Same as numpy array but can have an info attribute"""
-
-    def __new__(cls, input_array, info=None):
-        # Input array is an array_like
-        # We first cast to be our class type
-        obj = np.asarray(input_array).view(cls)
-        # add the new attribute to the created instance
-        obj.info = info
-        # Finally, we must return the newly created object:
-        return obj
-
-    def __array_finalize__(self, obj):
-        # see InfoArray.__array_finalize__ for comments
-        if obj is None:
-            return
-        self.info = getattr(obj, 'info', None)
+            out.append(item)
+            continue
+        stack.extend(reversed(list(it)))
+    return out
 
 
 def iter_arg_attrs_if_attr_exists(*args, attr: str):
     """Iterate over the specified attribute of the arguments if they exist."""
 
-    yield from (a for input in args if (a := getattr(input, attr, None)) is not None)
+    get_attr = operator.attrgetter(attr)
+    for arg in args:
+        try:
+            a = get_attr(arg)
+        except AttributeError:
+            continue
+        if a is not None:
+            yield a
@@ -1,18 +1,77 @@
-from collections import defaultdict
-from ceng.common import InfoArray, iter_arg_attrs_if_attr_exists
-from scipy.interpolate import interp1d
+from ceng.common import iter_arg_attrs_if_attr_exists, lazy_njit, prange
+from scipy.interpolate import interp1d, RegularGridInterpolator
 import numpy as np
 
 # Note: the scipy interp2d algorithm doesn't give the right results for twice interpolation of figures with multiple
 # curves. no idea why, so have to write own interp2d algorithm.
 
 
+@lazy_njit(parallel=True, cache=True)
+def _interp_rows(x, xp, fp_rows, out):
+    """Interpolate x (1d) along each row of fp_rows (2d) in parallel, writing the results to the rows of out."""
+    for i in prange(fp_rows.shape[0]):
+        out[i] = np.interp(x, xp, fp_rows[i])
+
+
+def _np_interp_factory(xp, fp, bounds_error, fill_value, axis=-1, assume_sorted=False):
+    """Linear 1d interpolation function along an axis of fp using np.interp; mirrors the behavior of interp1d."""
+
+    xp = np.asarray(xp, dtype=np.float64)
+    fp = np.asarray(fp, dtype=np.float64)
+    axis = axis % fp.ndim
+    if not assume_sorted:
+        # np.interp requires increasing sample points
+        order = np.argsort(xp, kind="stable")
+        xp = xp[order]
+        fp = np.take(fp, order, axis=axis)
+    fp = np.moveaxis(fp, axis, -1)
+    other_shape = fp.shape[:-1]
+    fp_rows = np.ascontiguousarray(fp.reshape(-1, xp.size))
+    lo, hi = xp[0], xp[-1]
+    extrapolate = isinstance(fill_value, str) and fill_value == "extrapolate"
+    if extrapolate:
+        if bounds_error:
+            raise ValueError("Cannot extrapolate and raise at the same time.")
+        # np.interp clamps to the end values; out of bounds points are corrected using the slopes of the end segments
+        slope_below = ((fp_rows[:, 1] - fp_rows[:, 0]) / (xp[1] - xp[0]))[:, None]
+        slope_above = ((fp_rows[:, -1] - fp_rows[:, -2]) / (xp[-1] - xp[-2]))[:, None]
+    else:
+        fill_below, fill_above = fill_value if isinstance(fill_value, tuple) else (fill_value, fill_value)
+        # each fill value can be a scalar or broadcast against the non-interpolation dimensions (same as interp1d)
+        fill_below, fill_above = (np.broadcast_to(np.nan if fill is None else fill, other_shape).reshape(-1, 1)
+                                  for fill in (fill_below, fill_above))
+
+    def interpolate(x):
+        x = np.asarray(x, dtype=np.float64)
+        below, above = x < lo, x > hi
+        if bounds_error and (below.any() or above.any()):
+            raise ValueError(f"A value in x_new is outside of the interpolation range ({lo}, {hi}).")
+        x_flat, below, above = x.ravel(), below.ravel(), above.ravel()
+        result = np.empty((fp_rows.shape[0], x.size))
+        _interp_rows(x_flat, xp, fp_rows, result)
+        if extrapolate:
+            result += np.where(below, (x_flat - lo) * slope_below, 0) + np.where(above, (x_flat - hi) * slope_above, 0)
+        else:
+            result = np.where(below, fill_below, np.where(above, fill_above, result))
+        result = result.reshape((*other_shape, *x.shape))
+        # put the interpolated dimensions where the interpolation axis was (same as interp1d)
+        x_dims = range(len(other_shape), result.ndim)
+        return np.moveaxis(result, x_dims, range(axis, axis + x.ndim))
+
+    return interpolate
+
+
 def _interp1d_rows(inner_arr, col_arr, bounds_error, fill_value, dependent_2d):
     if dependent_2d==True:
-        # z array is 2d so rows will be dependent argument to interp1d
-        return [interp1d(col_arr, row, bounds_error=bounds_error, fill_value=fill_value) for row in inner_arr]
-    # x or y is 2d so rows will be independent argument to interp1d
-    return [interp1d(row, col_arr, bounds_error=bounds_error, fill_value=fill_value) for row in inner_arr]
+        # z array is 2d so rows will be dependent argument to interp1d; interpolate all rows at once
+        return _np_interp_factory(col_arr, inner_arr, bounds_error, fill_value, axis=1)
+    # x or y is 2d so rows will be independent argument to interp1d; each row needs its own interpolator
+    row_funcs = [_np_interp_factory(row, col_arr, bounds_error, fill_value) for row in inner_arr]
+
+    def interpolate_rows(col_v):
+        return np.array([f(col_v) for f in row_funcs])
+
+    return interpolate_rows
 
 
 def _get_row_1darr_col_1darr_and_inner_2darr(x_seq, y_seq, z_seq, first_dependent_axis):
@@ -25,17 +84,17 @@ def _get_row_1darr_col_1darr_and_inner_2darr(x_seq, y_seq, z_seq, first_dependen
     if all(d==1 for d in (x_d, y_d)):
         # z assumed 2d, first dependent axis is x
         row_arr, col_arr = (x_arr, y_arr) if first_dependent_axis == 0 else (y_arr, x_arr)
-        inner_arr = InfoArray(z_arr, info="z")
+        inner_arr, info = z_arr, "z"
     elif all(d==1 for d in (x_d, z_d)):
         # y assumed 2d, first dependent axis is x
         y_arr_maybe_transposed = y_arr.transpose() if first_dependent_axis == 1 else y_arr
         row_arr, col_arr = (x_arr, z_arr) if first_dependent_axis == 0 else (z_arr, x_arr)
-        inner_arr = InfoArray(y_arr_maybe_transposed, info="y")
+        inner_arr, info = y_arr_maybe_transposed, "y"
     elif all(d==1 for d in (y_d, z_d)):
         # x assumed 2d, first dependent axis is y
         x_arr_maybe_transposed = x_arr.transpose() if first_dependent_axis == 1 else x_arr
         row_arr, col_arr = (y_arr, z_arr) if first_dependent_axis == 0 else (z_arr, y_arr)
-        inner_arr = InfoArray(x_arr_maybe_transposed, info="x")
+        inner_arr, info = x_arr_maybe_transposed, "x"
     else:
         raise ValueError("two 1d sequences or arrays are required")
 
@@ -43,7 +102,7 @@ def _get_row_1darr_col_1darr_and_inner_2darr(x_seq, y_seq, z_seq, first_dependen
         raise ValueError(f"Shape of inner 2d array does not match sizes of outer arrays with first dependent at axis "
                          f"{first_dependent_axis}")
 
-    return row_arr, col_arr, inner_arr
+    return row_arr, col_arr, inner_arr, info
 
 
 def _twice_interpolate_2d_using_list_of_interpolation_functions(col_v, row_v, row_arr, interp1d_rows,
@@ -54,24 +113,68 @@ def _twice_interpolate_2d_using_list_of_interpolation_functions(col_v, row_v, ro
      ----------
       col_v, row_v: array_like
          column and row values to be interpolated.
-     row_arr : list of interpolation functions
-         values to used to create the interpolation function for second interpolation step
-     interp1d_rows : list of interpolation functions
-         1d interpolation functions to be used for first interpolation step
+     row_arr : array_like
+         sorted values to used to create the interpolation function for second interpolation step
+     interp1d_rows : interpolation function
+         1d interpolation function of all rows to be used for first interpolation step
 
      Returns
      -------
      The interpolated value(s).
     """
 
-    temp_x = [f(col_v) for f in interp1d_rows]
-    return interp1d(row_arr, temp_x, bounds_error=bounds_error, fill_value=fill_value)(row_v)
+    temp_x = interp1d_rows(col_v)
+    # row_arr is sorted up front so the second step only has to wrap temp_x
+    return _np_interp_factory(row_arr, temp_x, bounds_error, fill_value, axis=0, assume_sorted=True)(row_v)
+
+
+def _regular_grid_interp(row_arr, col_arr, inner_arr, bounds_error, fill_value):
+    """Bilinear interpolation function of the 2d dependent data over the grid of rows and columns.
+
+    Same results as interpolating twice, in a single pass. Returns None if the grid is not strictly increasing.
+    """
+
+    col_order = np.argsort(col_arr, kind="stable")
+    col_arr, inner_arr = col_arr[col_order].astype(np.float64), inner_arr[:, col_order]
+    if not (np.all(np.diff(row_arr) > 0) and np.all(np.diff(col_arr) > 0)):
+        return None
+    rgi = RegularGridInterpolator((row_arr, col_arr), inner_arr, method="linear", bounds_error=bounds_error,
+                                  fill_value=np.nan if fill_value is None else fill_value)
+
+    def interpolate(row_v, col_v):
+        row_v, col_v = np.asarray(row_v, dtype=np.float64), np.asarray(col_v, dtype=np.float64)
+        # every row value with every column value, same as the two step interpolation
+        row_v = row_v.reshape((*row_v.shape, *(1,)*col_v.ndim))
+        points = np.stack(np.broadcast_arrays(row_v, col_v), axis=-1)
+        return rgi(points.reshape(-1, 2)).reshape(points.shape[:-1])
+
+    return interpolate
 
 
 def _twice_interp1d(x_seq, y_seq, z_seq, first_dependent_axis, bounds_error, fill_value):
 
-    row_arr, col_arr, inner_arr = _get_row_1darr_col_1darr_and_inner_2darr(x_seq, y_seq, z_seq, first_dependent_axis)
-    dependent_2d = True if inner_arr.info=="z" else False
+    row_arr, col_arr, inner_arr, info = _get_row_1darr_col_1darr_and_inner_2darr(x_seq, y_seq, z_seq,
+                                                                                   first_dependent_axis)
+    dependent_2d = info == "z"
+    # sort the rows once here instead of for every second interpolation step
+    order = np.argsort(row_arr, kind="stable")
+    row_arr, inner_arr = row_arr[order].astype(np.float64), inner_arr[order]
+
+    # RegularGridInterpolator only supports a single scalar fill value; "extrapolate" and (below, above) fill values
+    # have to be interpolated twice
+    scalar_fill = fill_value is None or (np.isscalar(fill_value) and not isinstance(fill_value, str))
+    grid_interp = (_regular_grid_interp(row_arr, col_arr, inner_arr, bounds_error, fill_value)
+                   if dependent_2d and scalar_fill else None)
+    if grid_interp is not None:
+
+        def interpolate(x, y):
+            axis_dict = {first_dependent_axis: x, first_dependent_axis^1: y}
+            return grid_interp(*(axis_dict[i] for i in (0,1)))
+
+        return interpolate
+
+    # the x or y array is 2d (irregular grid), the grid has repeated values, or the fill value isn't a scalar:
+    # interpolate twice
     interp1d_rows = _interp1d_rows(inner_arr, col_arr, bounds_error, fill_value, dependent_2d=dependent_2d)
 
     def interpolate(x, y):
@@ -128,16 +231,28 @@ def _keys_view_for_all_args_if_arg_has_keys(*args):
     Returns None if there is not at least one mapping. Raises ValueError if there are conflicting sets of keys in any
     mappings."""
 
-    keys_iterator = (keys() for keys in iter_arg_attrs_if_attr_exists(*args, attr="keys"))
-    for keys_view in keys_iterator:
-        if not all(kv == keys_view for kv in keys_iterator):
-            raise ValueError("mappings must have the same keys")
-        break
-    else:
+    keys_views = [keys() for keys in iter_arg_attrs_if_attr_exists(*args, attr="keys")]
+    if not keys_views:
         return None
+    keys_view, *other_keys_views = keys_views
+    for other_keys_view in other_keys_views:
+        if other_keys_view != keys_view:
+            raise ValueError("mappings must have the same keys")
     return keys_view
 
 
+class _Const:
+    """Stand-in for a mapping that has the same value for every key."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __getitem__(self, key):
+        return self.value
+
+
 def interp_dict(x, y, z=None, axis=0, bounds_error=True, fill_value=None):
     """Produce a dictionary of interpolation functions ("interpolants").
 
@@ -152,11 +267,7 @@ def interp_dict(x, y, z=None, axis=0, bounds_error=True, fill_value=None):
     keys_view = _keys_view_for_all_args_if_arg_has_keys(x, y, z)
 
     # turn x y z into mappings (if they aren't already)
-    x_dct, y_dct, z_dct = (input if hasattr(input, "keys") else defaultdict(f)
-                           for input, f in zip((x, y, z),
-                                               (lambda: x,
-                                                lambda: y,
-                                                lambda: z)))
+    x_dct, y_dct, z_dct = (input if hasattr(input, "keys") else _Const(input) for input in (x, y, z))
 
     # suss out the independent and dependents variables, and the interpolation method
     dependent_dct = y_dct if z is None else z_dct
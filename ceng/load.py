@@ -11,52 +11,58 @@ The result represents the 3 different answers from this load combination.
 """
 
 import re
-import ast
+import functools
+import inspect
+import numbers
 import dataclasses
 from typing import TypeVar, Generic, Callable
 import numpy as np
 import numpy.typing as npt
-import numba as nb
-import wrapt
 
 T = TypeVar('T')
 
-_valid_operators = list("&|()")
-_load_combination_re = re.compile("|".join("\\"+op for op in _valid_operators))
-_multiply_re = re.compile(r"\*")
+_token_re = re.compile(r"(?P<number>\d+\.?\d*|\.\d+)|(?P<identifier>[^\W\d]\w*)|(?P<operator>[&|()*])"
+                       r"|(?P<invalid>\S)")
 
 
 class LoadCombinationExpressionError(Exception):
     pass
 
 
-def _get_identifiers(expr):
-    """Parse a load combination string. Return a tuple of valid identifiers used in the string."""
+def _parse_expr(expr):
+    """Parse a load combination string. Return a tuple of valid identifiers used in the string and the compiled
+    expression."""
 
-    expr_lst = [s.strip() for s in _load_combination_re.split(expr) if s.strip()]
     identifiers = []
-
-    for sub_expr in expr_lst:
-        *lhs, rhs = (s.strip() for s in _multiply_re.split(sub_expr))
-        # None is the case when the RHS is a parenthesized expression
-        maybe_identifier = rhs if rhs else None
-        for maybe_number in lhs:
-            if not maybe_number.replace('.', '1').isdecimal():
-                # LHS of multiplication operation has to be a number
-                raise LoadCombinationExpressionError(expr, sub_expr)
-
-        if maybe_identifier is not None:
-            if not maybe_identifier.isidentifier():
-                raise LoadCombinationExpressionError(expr, sub_expr)
-            else:
-                identifiers.append(maybe_identifier)
+    prev_kind = None
+
+    for match in _token_re.finditer(expr):
+        kind, token = match.lastgroup, match.group()
+        if kind == "invalid":
+            raise LoadCombinationExpressionError(expr, token)
+        # LHS of multiplication operation has to be a number, and numbers can only be used to multiply
+        if (token == "*") != (prev_kind == "number"):
+            raise LoadCombinationExpressionError(expr, token)
+        if kind == "identifier":
+            identifiers.append(token)
+        prev_kind = kind
+
+    if prev_kind == "number":
+        raise LoadCombinationExpressionError(expr)
 
     try:
-        ast.parse(expr)
+        code = compile(expr, "<combination>", "eval")
     except Exception as e:
         raise LoadCombinationExpressionError(expr) from e
 
-    return tuple(identifiers)
+    return tuple(identifiers), code
+
+
+def _get_identifiers(expr):
+    """Parse a load combination string. Return a tuple of valid identifiers used in the string."""
+
+    identifiers, _ = _parse_expr(expr)
+    return identifiers
 
 
 @dataclasses.dataclass
@@ -75,8 +81,14 @@ class _Factored(Generic[T]):
     load_type: T
     factor: float = 1.0
 
+    def _with_factor(self, factor):
+        """A copy with a new factor. Skips the generated __init__ since the fields are already known."""
+        factored = object.__new__(type(self))
+        factored.__dict__.update(load_type=self.load_type, factor=factor)
+        return factored
+
     def __rmul__(self, other):
-        return type(self)(self.load_type, self.factor * other)
+        return self._with_factor(self.factor * other)
 
     def __or__(self, other):
         if isinstance(other, _Factored):
@@ -98,13 +110,10 @@ class _Factored(Generic[T]):
 class _Group(tuple[_Factored]):
     """_Factored objects that have been combined"""
 
-    @property
-    def matrix(self):
-        factor_arr = np.array([factored.factor for factored in self])
-        if isinstance(self, _GroupOr):
-            return np.diag(factor_arr)
-        elif isinstance(self, _GroupAnd):
-            return factor_arr.reshape((1, factor_arr.shape[0]))
+    matrix: np.ndarray
+
+    def _factor_arr(self):
+        return np.fromiter((factored.factor for factored in self), dtype=np.float64, count=len(self))
 
 
 class _GroupOr(_Group):
@@ -113,6 +122,11 @@ class _GroupOr(_Group):
         factored_load_type_a | factored_load_type_b
     """
 
+    @functools.cached_property
+    def matrix(self):
+        """The load factors as a matrix. The matrix is diagonal, so only the diagonal (1d) is returned."""
+        return self._factor_arr()
+
     def __or__(self, other):
         if isinstance(other, _Factored):
             return type(self)((*self, other))
@@ -134,7 +148,7 @@ class _GroupOr(_Group):
         return NotImplemented
 
     def __rmul__(self, other):
-        return type(self)(type(v)(v.load_type, other*v.factor) for v in self)
+        return type(self)(v._with_factor(other*v.factor) for v in self)
 
 
 class _GroupAnd(_Group):
@@ -143,6 +157,11 @@ class _GroupAnd(_Group):
         factored_load_type_a & factored_load_type_b
     """
 
+    @functools.cached_property
+    def matrix(self):
+        """The load factors as a matrix with a single row."""
+        return self._factor_arr().reshape((1, len(self)))
+
     def __or__(self, other):
         return  NotImplemented
 
@@ -158,19 +177,62 @@ class _GroupAnd(_Group):
         return  NotImplemented
 
 
+@functools.lru_cache(maxsize=1024)
+def _parse_combination(expr):
+    """Parse a load combination string. Return the identifiers and a (read only) numpy array representing the load
+    combination.
+
+    Cached so that the same expression is only parsed once.
+    """
+
+    identifiers, compiled_expr = _parse_expr(expr)
+
+    ns = {k:_Factored(k) for k in identifiers}
+    try:
+        expr_eval = eval(compiled_expr, ns)
+    except Exception as e:
+        raise LoadCombinationExpressionError(expr) from e
+
+    if isinstance(expr_eval, _Factored):
+        group_tup = (_GroupAnd((expr_eval,)),)
+    elif isinstance(expr_eval, _GroupAnd):
+        group_tup = (expr_eval,)
+    elif isinstance(expr_eval, tuple):
+        group_tup = expr_eval
+    else:
+        raise LoadCombinationExpressionError(f"{expr!r} evaluated to type {type(expr_eval).__qualname__}")
+
+    arr_seq = [group.matrix for group in group_tup]
+    matrix = np.ascontiguousarray(_row_by_row_concatenation_of_array_seq(arr_seq), dtype=np.float64)
+    # shared by every Combination of the same expression
+    matrix.flags.writeable = False
+    return identifiers, matrix
+
+
 @dataclasses.dataclass(frozen=True)
 class Combination:
     """A callable expression of the combination of multiple loads."""
 
     expr: str
+    # dtype of the matrix and the results; e.g. np.float32 halves memory traffic for large arrays of load values (at
+    # the cost of precision)
+    dtype: npt.DTypeLike = dataclasses.field(default=np.float64, repr=False)
     matrix: npt.ArrayLike = dataclasses.field(init=False, repr=False, compare=False)
 
-    _identifiers: list[str] = dataclasses.field(init=False, repr=False)
+    _identifiers: tuple[str, ...] = dataclasses.field(init=False, repr=False)
     _call_handler: Callable[..., npt.ArrayLike] = dataclasses.field(init=False, repr=False, compare=False)
 
     def __post_init__(self):
-        object.__setattr__(self, "_identifiers", _get_identifiers(self.expr))
-        self._init_matrix()
+        identifiers, matrix = _parse_combination(self.expr)
+        object.__setattr__(self, "_identifiers", identifiers)
+        # normalized so that e.g. np.float32 and "float32" compare equal
+        object.__setattr__(self, "dtype", np.dtype(self.dtype))
+        if not np.issubdtype(self.dtype, np.floating):
+            raise TypeError(f"dtype must be a floating point type, not {self.dtype}")
+        if matrix.dtype != self.dtype:
+            matrix = matrix.astype(self.dtype)
+            matrix.flags.writeable = False
+        object.__setattr__(self, "matrix", matrix)
         self._init_call_handler()
 
     def __str__(self):
@@ -181,84 +243,28 @@ class Combination:
             return type(self)((*self, other))
         return  NotImplemented
 
-    def _init_matrix(self):
-        """Initialize a numpy array representing the load combination."""
-
-        ns = {k:_Factored(k) for k in self._identifiers}
-        try:
-            expr_eval = eval(self.expr, ns)
-        except Exception as e:
-            raise LoadCombinationExpressionError(self.expr) from e
-
-        if isinstance(expr_eval, _Factored):
-            group_tup = (_GroupAnd((expr_eval,)),)
-        elif isinstance(expr_eval, _GroupAnd):
-            group_tup = (expr_eval,)
-        elif isinstance(expr_eval, tuple):
-            group_tup = expr_eval
-        else:
-            raise LoadCombinationExpressionError(f"{self.expr!r} evaluated to type {type(expr_eval).__qualname__}")
-
-        arr_seq = [group.matrix for group in group_tup]
-        object.__setattr__(self, "matrix", _row_by_row_concatenation_of_array_seq(arr_seq))
-
     def _init_call_handler(self):
+        """Initialize a function that applies the load combination matrix to the load values."""
 
-        # TODO: create handler using AST
-
-        comma_sep_identifiers = ", ".join(self._identifiers)
-        f_src_template = f"""
-@{{decorator}}
-def {{func_name}}({comma_sep_identifiers}):
-    {{func_body}}"""
-
-        ns = dict(vectorize=nb.vectorize, njit=nb.njit)
-        row_funcs = list()
-
-        for factors in self.matrix:
-            # vectorize each of the row funcs to support broadcasting
-            vectorized_src_format_dict = dict(
-                decorator = "vectorize",
-                func_name = "vectorized",
-                func_body = "return " + " + ".join(f"{f}*{i}" for f, i in zip(factors, self._identifiers))
-            )
-            vectorized_src = f_src_template.format(**vectorized_src_format_dict)
-
-            # jit each of the row funcs to support kwd args
-            njited_src_format_dict = dict(
-                decorator = "njit",
-                func_name = "njited",
-                func_body = f"return vectorized({comma_sep_identifiers})"
-            )
-            njited_src = f_src_template.format(**njited_src_format_dict)
-
-            src = vectorized_src + "\n\n\n" + njited_src
-
-            ns_copy = ns.copy()
-            exec(src, ns_copy)
-            row_funcs.append(ns_copy["njited"])
-
-        if len(row_funcs)==1:
-            row_func = row_funcs[0]
-
-            def _call_handler(*args, **kwargs):
-                return np.array(row_func(*args, **kwargs))
-        else:
-            def _call_handler(*args, **kwargs):
-                return np.array([f(*args, **kwargs) for f in row_funcs])
-
-        # prime the function for the float type (this seems slightly faster than providing dtype info)
-        _call_handler(*(1. for _ in range(len(self._identifiers))))
+        call_handler = _make_call_handler(self.matrix.tobytes(), self.matrix.shape, self.matrix.dtype,
+                                          self._identifiers)
+        object.__setattr__(self, "_call_handler", call_handler)
 
-        object.__setattr__(self, "_call_handler", _call_handler)
+    def _decorator(self, func, inner_dec=lambda f: f, bound=False):
+        call_handler = self._call_handler
 
-    def _decorator(self, func, inner_dec=lambda f: f):
-
-        @wrapt.decorator
-        def combine_the_loads_wrapper(wrapped, instance, args, kwargs):
-            return self(*args, **kwargs)
+        if bound:
+            # the instance or class is passed as the first argument; it is not a load
+            @functools.wraps(func)
+            def combine_the_loads_wrapper(_instance_or_cls, /, *args, **kwargs):
+                return call_handler(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def combine_the_loads_wrapper(*args, **kwargs):
+                return call_handler(*args, **kwargs)
 
-        return combine_the_loads_wrapper(inner_dec(func))
+        combine_the_loads_wrapper.batch = self.batch
+        return inner_dec(combine_the_loads_wrapper)
 
     def function(self, func):
         """Decorator to apply to a load combination function. Automatically implements load combination.
@@ -293,7 +299,7 @@ def {{func_name}}({comma_sep_identifiers}):
         array([5.5, 6. , 6.5])
         """
 
-        return self._decorator(func)
+        return self._decorator(func, bound=True)
 
     def staticmethod(self, func):
         """Decorator to apply to a load combination method. Automatically implements load combination.
@@ -329,12 +335,96 @@ def {{func_name}}({comma_sep_identifiers}):
         array([5.5, 6. , 6.5])
         """
 
-        return self._decorator(func, classmethod)
+        return self._decorator(func, classmethod, bound=True)
+
+    def batch(self, values):
+        """Apply the load combination to many load cases at once using a single matrix multiplication.
+
+        The values are 2d: one row per load case, with the loads in the order they appear in the expression. Also
+        available as the batch attribute of decorated functions.
+
+        Example:
+        >>> combo = Combination("1.6*D & 1.2*L & 0.5*(S | Lr | W)")
+        >>> combo.batch([[1, 2, 3, 4, 5],
+        ...              [1, 1, 1, 1, 1]])
+        array([[5.5, 6. , 6.5],
+               [3.3, 3.3, 3.3]])
+        """
+
+        return np.asarray(values, dtype=self.matrix.dtype) @ self.matrix.T
 
     def __call__(self, *args, **kwargs):
         return self._call_handler(*args, **kwargs)
 
 
+# largest combination matrix evaluated with generated arithmetic (instead of matmul) for scalar load values
+_CODEGEN_MATRIX_SIZE = 64
+
+
+def _generate_scalar_combination(matrix, identifiers):
+    """Generate a function of scalar load values that evaluates each row of the matrix using plain arithmetic."""
+
+    row_srcs = []
+    for factors in matrix.tolist():
+        # zero terms are kept so that inf and nan loads give the same results as the matmul
+        row_srcs.append(" + ".join(f"{factor!r}*{identifier}" for factor, identifier in zip(factors, identifiers)))
+    src = f"""
+def scalar_combination({", ".join(identifiers)}):
+    return ({", ".join(row_srcs)},)"""
+
+    ns = dict()
+    exec(src, ns)
+    return ns["scalar_combination"]
+
+
+@functools.lru_cache(maxsize=128)
+def _make_call_handler(matrix_bytes, matrix_shape, matrix_dtype, identifiers):
+    """Make a function that applies a load combination matrix to the load values.
+
+    Cached so that combinations with the same matrix and identifiers share a single call handler.
+    """
+
+    matrix = np.frombuffer(matrix_bytes, dtype=matrix_dtype).reshape(matrix_shape)
+    rows, n = matrix_shape
+    identifiers_set = frozenset(identifiers)
+    scalar_combination = (_generate_scalar_combination(matrix, identifiers)
+                          if matrix.size <= _CODEGEN_MATRIX_SIZE else None)
+    identifiers_sig = inspect.Signature([inspect.Parameter(i, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+                                         for i in identifiers])
+
+    def _call_handler(*args, **kwargs):
+        if kwargs:
+            if not args and kwargs.keys() == identifiers_set:
+                args = tuple(kwargs[i] for i in identifiers)
+            else:
+                args = tuple(identifiers_sig.bind(*args, **kwargs).arguments.values())
+        elif len(args) != n:
+            # raises the appropriate TypeError
+            identifiers_sig.bind(*args)
+        # fast paths for scalar load values
+        if scalar_combination is not None and all(type(arg) in (int, float) for arg in args):
+            result = np.array(scalar_combination(*args), dtype=matrix_dtype)
+            return result.reshape(()) if rows == 1 else result
+        if all(isinstance(arg, numbers.Real) for arg in args):
+            result = matrix @ np.fromiter(args, dtype=matrix_dtype, count=n)
+            return result.reshape(()) if rows == 1 else result
+        values = [np.asarray(arg) for arg in args]
+        if any(v.dtype.kind not in "biufc" for v in values):
+            raise TypeError("load values must be numbers or arrays of numbers")
+        # complex load values give complex results
+        dtype = (np.result_type(matrix_dtype, np.complex64) if any(v.dtype.kind == "c" for v in values)
+                 else matrix_dtype)
+        # broadcast the load values against each other and apply all rows of the matrix in a single matmul
+        values = np.broadcast_arrays(*(v.astype(dtype, copy=False) for v in values))
+        shape = values[0].shape
+        result = matrix @ np.stack(values).reshape(n, -1)
+        if rows == 1:
+            return result[0].reshape(shape)
+        return result.reshape((rows, *shape))
+
+    return _call_handler
+
+
 def _row_by_row_concatenation_of_array_seq(arr_seq):
     """Combine two arrays using row by row concatenation.
 
@@ -354,13 +444,32 @@ def _row_by_row_concatenation_of_array_seq(arr_seq):
     [4,5,6,3,4],
     [7,8,9,1,2],
     [7,8,9,3,4]]
+
+    A 1d array is taken as the diagonal of a square array; its zeros are never tiled, only the diagonal is written.
     """
 
-    seq_rows = np.array([arr.shape[0] for arr in arr_seq])
-    products = np.array([seq_rows[i:].prod() for i,_ in enumerate(seq_rows)])
-    rows = seq_rows.prod()
+    seq_rows = np.fromiter((arr.shape[0] for arr in arr_seq), dtype=np.int64, count=len(arr_seq))
+    if (seq_rows == 1).all():
+        # nothing to combine row by row (e.g. only _GroupAnd matrices)
+        return np.hstack([arr.reshape((1, -1)) for arr in arr_seq])
+
+    # number of rows in the cartesian product of each array with all the arrays after it
+    products = np.cumprod(seq_rows[::-1])[::-1]
+    rows = products[0]
+
+    result = np.empty((rows, sum(arr.shape[-1] for arr in arr_seq)), dtype=np.result_type(*arr_seq))
+    col = 0
+    for arr, arr_rows, prod in zip(arr_seq, seq_rows, products):
+        cols = arr.shape[-1]
+        # split the rows of the result columns into (outer repeats, array rows, inner repeats) and broadcast the
+        # array into them; writes each array directly into the result without intermediate copies
+        result_cols = result[:, col:col+cols].reshape((rows//prod, arr_rows, prod//arr_rows, cols))
+        if arr.ndim == 1:
+            result_cols[...] = 0
+            diag = np.arange(arr_rows)
+            result_cols[:, diag, :, diag] = arr[:, np.newaxis, np.newaxis]
+        else:
+            result_cols[...] = arr[np.newaxis, :, np.newaxis, :]
+        col += cols
 
-    return np.hstack([
-        np.tile(np.repeat(arr, repeats=prod//arr_rows, axis=0), (rows//prod ,1))
-        for arr, arr_rows, prod in zip(arr_seq, seq_rows, products)
-    ])
+    return result
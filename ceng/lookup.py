@@ -1,4 +1,10 @@
+import numbers
+import operator
+from bisect import bisect_right
 from collections.abc import Mapping
+from itertools import islice, repeat
+
+_missing = object()
 
 
 class IterableDict(Mapping):
@@ -11,22 +17,98 @@ class IterableDict(Mapping):
     'spam'
     >>> i_dict[4]
     'eggs'
+
+    range keys are not expanded; they are looked up as intervals (unless they overlap other keys):
+
+    >>> i_dict = IterableDict(((range(0, 1_000_000), "spam"), (range(1_000_000, 2_000_000), "eggs")))
+    >>> i_dict[1_500_000]
+    'eggs'
     """
     root: Mapping
     _dict: dict
+    _ranges: list
+    _range_starts: list
+    _segments: list
 
     def __init__(self, args):
         self.root = dict(args)
-        self._dict = {k: v for keys, v in self.root.items() for k in keys}
+        self._dict = {}
+        self._ranges = []
+        # ranges, or the number of keys each non-range item added to _dict; in the original order for __iter__
+        self._segments = []
+        update = self._dict.update
+        # the keys of every item, kept in case they have to be expanded again (iterators can only be read once)
+        items = []
+        for keys, v in self.root.items():
+            if isinstance(keys, range):
+                if keys:
+                    self._ranges.append((keys if keys.step > 0 else keys[::-1], v))
+                    self._segments.append(keys)
+            else:
+                keys = tuple(keys)
+                n = len(self._dict)
+                update(zip(keys, repeat(v)))
+                self._segments.append(len(self._dict) - n)
+            items.append((keys, v))
+        self._ranges.sort(key=lambda item: item[0].start)
+        self._range_starts = [r.start for r, _ in self._ranges]
+
+        if self._ranges_overlap_keys():
+            # later keys have to override earlier ones like a vanilla dict; expand everything instead
+            self._dict.clear()
+            for keys, v in items:
+                update(zip(keys, repeat(v)))
+            self._ranges, self._range_starts, self._segments = [], [], [len(self._dict)]
+
+    def _ranges_overlap_keys(self):
+        for (r0, _), (r1, _) in zip(self._ranges, self._ranges[1:]):
+            if r1.start <= r0[-1]:
+                return True
+        return any(self._range_value(k, _missing) is not _missing for k in self._dict)
+
+    def _range_value(self, k, default):
+        """Look up the value of the range containing k."""
+        try:
+            k = operator.index(k)
+        except TypeError:
+            # other numbers (float, Decimal, Fraction, complex, numpy scalars...) are in a range if equal to an int
+            if not isinstance(k, numbers.Number):
+                return default
+            try:
+                i = int(k.real)
+            except (TypeError, ValueError, OverflowError):
+                return default
+            if i != k:
+                return default
+            k = i
+        i = bisect_right(self._range_starts, k) - 1
+        if i >= 0:
+            r, v = self._ranges[i]
+            if k in r:
+                return v
+        return default
 
     def __len__(self):
-        return len(self._dict)
+        return len(self._dict) + sum(len(r) for r, _ in self._ranges)
 
     def __iter__(self):
-        yield from self._dict.keys()
+        dict_keys = iter(self._dict)
+        for segment in self._segments:
+            if isinstance(segment, range):
+                yield from segment
+            else:
+                yield from islice(dict_keys, segment)
 
     def __getitem__(self, k):
-        return self._dict.__getitem__(k)
+        try:
+            return self._dict[k]
+        except KeyError:
+            pass
+        if self._ranges:
+            v = self._range_value(k, _missing)
+            if v is not _missing:
+                return v
+        raise KeyError(k)
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self.root.__repr__()})"
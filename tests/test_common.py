@@ -0,0 +1,39 @@
+from ceng.common import _compile_with_numba, flatten
+import pytest
+
+
+@pytest.mark.parametrize("maybe_seq, flattened", [
+    (1, [1]),
+    ([1, [2, [3, 4]], (5,)], [1, 2, 3, 4, 5]),
+    (["ab", "c"], ["ab", "c"]),
+    ([b"ab", [b"c"]], [b"ab", b"c"]),
+])
+def test_flatten(maybe_seq, flattened):
+    assert flatten(maybe_seq) == flattened
+
+
+def test_flatten_empty_passthrough():
+    """Empty sequences are returned as is"""
+    empty = []
+    assert flatten(empty) is empty
+
+
+def test_flatten_deeply_nested():
+    """Nesting deeper than the recursion limit is fine"""
+    nested = [1]
+    for i in range(5000):
+        nested = [nested, i]
+    assert flatten(nested) == [1, *range(5000)]
+
+
+@pytest.mark.parametrize("value, disabled", [
+    ("1", True), ("true", True), ("0", False), ("", False),
+])
+def test_no_numba_environment_variable(monkeypatch, value, disabled):
+    pytest.importorskip("numba")
+    monkeypatch.setenv("CENG_NO_NUMBA", value)
+
+    def f(x):
+        return x + 1
+
+    assert (_compile_with_numba(f, {}) is f) is disabled
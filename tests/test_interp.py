@@ -1,6 +1,7 @@
 import pytest
 import numpy as np
-from ceng.interp import interp1d_twice, interp_dict
+from ceng.common import lazy_njit
+from ceng.interp import _interp_rows, interp1d_twice, interp_dict
 
 
 def test_documentation_example():
@@ -55,3 +56,98 @@ def test_twice_interp1d_with_2d_x(x, y, z):
                                  [5, 6]]), np.array([1, 2, 3]), np.array([1, 2]),
                        axis=0, bounds_error=False, fill_value=None)
     assert f(x, y) == z
+
+
+@pytest.mark.parametrize("fill_value, x, y, z", [
+    ("extrapolate", 0.5, 1, -0.5),
+    ("extrapolate", 3.5, 2, 9.5),
+    ((-1, 99), 0.5, 1, -1.0),
+    ((-1, 99), 3.5, 2, 99.0),
+    (7, 0.5, 1, 7.0),
+])
+def test_twice_interp1d_fill_value(fill_value, x, y, z):
+    f = interp1d_twice(np.array([1, 2]), np.array([1, 2, 3]), np.array([[1, 2, 3],
+                                                                        [4, 5, 6]]),
+                       axis=0, bounds_error=False, fill_value=fill_value)
+    np.testing.assert_almost_equal(f(x, y), z)
+
+
+@pytest.mark.parametrize("x, y, z", [
+    (20, 1.5, 1.5),
+    (20, 1, 2.0),
+    (15, 1, 1.5),
+    (40, 2, 2.0),
+])
+@pytest.mark.parametrize("x_seq, y_seq, z_seq, axis", [
+    # the 2d argument, and the same data with its first dependent axis along axis 1
+    ([1, 2], [[10, 20, 30], [20, 40, 60]], [1, 2, 3], 0),
+    ([1, 2, 3], [[10, 20], [20, 40], [30, 60]], [1, 2], 1),
+    ([[10, 20, 30], [20, 40, 60]], [1, 2], [1, 2, 3], 0),
+])
+def test_twice_interp1d_with_2d_x_or_y(x_seq, y_seq, z_seq, axis, x, y, z):
+    # some of the query values are only spanned by the rows the second step lands on
+    f = interp1d_twice(x_seq, y_seq, z_seq, axis=axis, bounds_error=False, fill_value=None)
+    np.testing.assert_almost_equal(f(x, y), z)
+
+
+@pytest.mark.parametrize("x, y, z", [
+    (20, 1.5, 1.5),
+    (20, 2.5, np.nan),
+    (30, 2.5, 1.25),
+])
+def test_twice_interp1d_with_2d_x_axis_1(x, y, z):
+    f = interp1d_twice([[10, 20, 30], [20, 40, 60]], [1, 2], [1, 2, 3], axis=1, bounds_error=False, fill_value=None)
+    np.testing.assert_almost_equal(f(x, y), z)
+
+
+def test_twice_interp1d_with_repeated_row_value():
+    f = interp1d_twice([1, 1, 2], [1, 2, 3], [[1, 2, 3],
+                                              [1, 2, 3],
+                                              [4, 5, 6]])
+    np.testing.assert_almost_equal(f(1.5, 1.5), 3.0)
+    np.testing.assert_almost_equal(f(1, 2), 2.0)
+
+
+@pytest.mark.parametrize("x, y, shape", [
+    (1.5, 2, ()),
+    ([1, 1.5, 2], 2, (3,)),
+    (1.5, [1, 2], (2,)),
+    ([1, 1.5, 2], [1, 3], (3, 2)),
+    ([[1], [2]], [1, 2, 3], (2, 1, 3)),
+])
+def test_twice_interp1d_output_shape(x, y, shape):
+    f = interp1d_twice([1, 2], [1, 2, 3], [[1, 2, 3],
+                                           [4, 5, 6]])
+    result = f(x, y)
+    assert np.shape(result) == shape
+    # every x value with every y value
+    expected = 3*np.reshape(x, (*np.shape(x), *(1,)*np.ndim(y))) + np.asarray(y) - 3
+    np.testing.assert_almost_equal(result, expected)
+
+
+@pytest.mark.parametrize("fill_value, expected", [
+    (None, [[np.nan, np.nan], [3.5, np.nan]]),
+    (-1, [[-1, -1], [3.5, -1]]),
+])
+def test_twice_interp1d_out_of_bounds(fill_value, expected):
+    f = interp1d_twice([1, 2], [1, 2, 3], [[1, 2, 3],
+                                           [4, 5, 6]], bounds_error=False, fill_value=fill_value)
+    np.testing.assert_almost_equal(f([0, 1.5], [2, 5]), expected)
+    with pytest.raises(ValueError):
+        interp1d_twice([1, 2], [1, 2, 3], [[1, 2, 3],
+                                           [4, 5, 6]], bounds_error=True)(0, 2)
+
+
+def test_interp_rows_without_numba(monkeypatch):
+    """The plain python function gives the same results as the compiled one"""
+    x = np.array([0.5, 1.0, 2.5, 3.0, 4.5])
+    xp = np.array([1.0, 2.0, 4.0])
+    fp_rows = np.arange(12.0).reshape(4, 3) ** 2
+    compiled_out, python_out = np.empty((4, x.size)), np.empty((4, x.size))
+    _interp_rows(x, xp, fp_rows, compiled_out)
+    monkeypatch.setenv("CENG_NO_NUMBA", "1")
+    # a fresh wrapper, since _interp_rows has already been compiled
+    interp_rows = lazy_njit(parallel=True)(_interp_rows.py_func)
+    interp_rows(x, xp, fp_rows, python_out)
+    np.testing.assert_array_equal(python_out, compiled_out)
+    np.testing.assert_array_equal(python_out, [np.interp(x, xp, fp) for fp in fp_rows])
@@ -178,6 +178,9 @@ def test_get_identifiers():
         except StopIteration:
             break
 
+    # non-ASCII identifiers are valid python identifiers too
+    assert _get_identifiers("1.2*Dé & 0.5*(é | Ω2)") == ("Dé", "é", "Ω2")
+
 
 def test_shape_of_combination_result():
     @Combination("D & 0.75*L & 0.75*0.6*W & 0.75*(Lr | S | R)").function
@@ -194,3 +197,52 @@ def test_shape_of_combination_result():
                          D + 0.75*L + 0.75*0.6*W + 0.75*S,
                          D + 0.75*L + 0.75*0.6*W + 0.75*R])
     np.testing.assert_almost_equal(result, expected)
+
+
+def test_batch_of_load_cases(combo_obj, load_combination_func):
+    cases = np.array([np.arange(1, len(combo_obj._identifiers)+1), np.ones(len(combo_obj._identifiers))])
+    result = load_combination_func.batch(cases)
+    assert result.shape == (2, combo_obj.matrix.shape[0])
+    for case, case_result in zip(cases, result):
+        npt.assert_almost_equal(case_result, np.reshape(combo_obj(*case), -1))
+
+
+def test_float32_combination():
+    combo64 = Combination("D & 0.75*L & 0.75*0.6*W & 0.75*(Lr | S | R)")
+    combo32 = Combination("D & 0.75*L & 0.75*0.6*W & 0.75*(Lr | S | R)", dtype=np.float32)
+    D = np.linspace(0, 10, 5)
+    for args in [(1, 2, 3, 4, 5, 6), (D, 2, 3, 4, 5, 6)]:
+        result = combo32(*args)
+        assert result.dtype == np.float32
+        npt.assert_allclose(result, combo64(*args), rtol=1e-6)
+    assert combo32.batch([[1, 2, 3, 4, 5, 6]]).dtype == np.float32
+
+
+def test_combination_dtype():
+    assert Combination("D & L", dtype=np.float32) == Combination("D & L", dtype="float32")
+    assert Combination("D & L", dtype="float32").dtype == np.dtype(np.float32)
+    for dtype in (int, np.int32, bool, complex, object):
+        with pytest.raises(TypeError):
+            Combination("D & L", dtype=dtype)
+
+
+def test_complex_and_invalid_load_values():
+    combo = Combination("D & 0.5*(L | S)")
+    npt.assert_almost_equal(combo(1j, 2, 3), [1+1j, 1.5+1j])
+    npt.assert_almost_equal(combo(np.array([1j, 2]), 2, 3), [[1+1j, 3], [1.5+1j, 3.5]])
+    for args in [("1", 2, 3), (1, [2, "3"], 3), (None, 2, 3)]:
+        with pytest.raises(TypeError):
+            combo(*args)
+
+
+@pytest.mark.filterwarnings("ignore:invalid value:RuntimeWarning")
+@pytest.mark.parametrize("args", [
+    (1.0, 1.0, np.inf),
+    (1.0, np.nan, 1.0),
+    (-np.inf, 1, 2.0),
+])
+def test_scalar_and_array_paths_agree_on_inf_and_nan(args):
+    combo = Combination("0.9*D & (W | E)")
+    expected = combo(*(np.array([arg]) for arg in args))[:, 0]
+    npt.assert_array_equal(combo(*args), expected)
+    npt.assert_array_equal(combo(*(np.float64(arg) for arg in args)), expected)
@@ -1,4 +1,7 @@
+from decimal import Decimal
+from fractions import Fraction
 from ceng.lookup import IterableDict
+import numpy as np
 import pytest
 
 
@@ -71,3 +74,27 @@ def test_error_on_incorrectly_provided_args():
     with pytest.raises(ValueError):
         # mistakenly provide a two-tuple instead a tuple of two-tuples
         IterableDict(([1], "spam"))
+
+
+def test_overlapping_keys_override_like_dict():
+    """Later keys override earlier ones like a vanilla dict, including keys inside of ranges"""
+    i_dict = IterableDict(((range(0, 10), "spam"), ((5,), "eggs"), (range(8, 12), "ham")))
+    assert [i_dict[k] for k in (0, 5, 7, 8, 11)] == ["spam", "eggs", "spam", "ham", "ham"]
+    assert list(i_dict) == list(range(0, 12))
+    assert len(i_dict) == 12
+
+
+@pytest.mark.parametrize("key, found", [
+    (2.0, True), (np.float32(2.0), True), (np.float16(3.0), True), (Decimal(2), True), (Fraction(4, 1), True),
+    (2+0j, True), (2.5, False), (2+1j, False), (float("nan"), False), (float("inf"), False),
+])
+def test_range_keys_equal_to_int(key, found):
+    """Numbers equal to an int in a range are found, like a vanilla dict of the expanded range"""
+    assert (key in IterableDict(((range(0, 10), "a"),))) is found
+
+
+def test_overlapping_keys_with_iterator_keys():
+    """Keys from iterators survive when overlapping ranges force the keys to be expanded"""
+    assert IterableDict(((range(0, 5), "b"), (iter([1, 2]), "a")))[1] == "a"
+    i_dict = IterableDict(((range(0, 5), "b"), (range(3, 8), "c"), ((x for x in [20, 21]), "a")))
+    assert [i_dict[k] for k in (0, 3, 20, 21)] == ["b", "c", "a", "a"]